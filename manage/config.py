@@ -138,6 +138,38 @@ class Config(ConfigParser.RawConfigParser):
         converter = self.converter.to_list
         return self._get_wrapper(sections, option, converter, default, raw)
 
+    def get_many(self, sections, options, default=None, raw=False):
+        """Returns a dictionary of config values from a given section,
+        converted to unicode. Sections are searched only once for all options.
+
+        :param sections:
+            The config section name, or a list of config section names to be
+            searched in order.
+        :param options:
+            A list of config option names.
+        :param default:
+            A default value used for options not found in any section.
+            Default is None.
+        :param raw:
+            If True, doesn't perform variable substitution if the values
+            have placeholders. Default is False.
+        :returns:
+            A dictionary mapping option names to config values.
+        """
+        converter = self.converter.to_unicode
+        return self._get_many_wrapper(sections, options, converter, default,
+            raw)
+
+    def getboolean_many(self, sections, options, default=None, raw=False):
+        """Returns a dictionary of config values from a given section,
+        converted to boolean.
+
+        See :methd:`get_many` for a description of the parameters.
+        """
+        converter = self.converter.to_boolean
+        return self._get_many_wrapper(sections, options, converter, default,
+            raw)
+
     def _get(self, section, option):
         """Wrapper for `RawConfigParser.get`."""
         return ConfigParser.RawConfigParser.get(self, section, option)
@@ -161,6 +193,38 @@ class Config(ConfigParser.RawConfigParser):
 
         return default
 
+    def _get_many_wrapper(self, sections, options, converter, default, raw):
+        """Like :meth:`_get_wrapper`, but looks up several options walking
+        the list of sections only once.
+        """
+        if isinstance(sections, basestring):
+            sections = [sections]
+
+        values = dict.fromkeys(options, default)
+        missing = list(options)
+        for section in sections:
+            not_found = []
+            for i, option in enumerate(missing):
+                try:
+                    value = self._get(section, option)
+                except ConfigParser.NoSectionError:
+                    not_found.extend(missing[i:])
+                    break
+                except ConfigParser.NoOptionError:
+                    not_found.append(option)
+                    continue
+
+                if not raw:
+                    value = self._interpolate(section, option, value)
+
+                values[option] = converter(value)
+
+            missing = not_found
+            if not missing:
+                break
+
+        return values
+
     def _interpolate(self, section, option, raw_value, tried=None):
         """Performs variable substituition in a config value."""
         variables = self._get_variable_names(section, option, raw_value)
@@ -1,7 +1,5 @@
 #!/usr/bin/env python
 import os
-import runpy
-import shutil
 import sys
 import textwrap
 
@@ -22,12 +20,70 @@ MISSING_GAE_SDK_MSG = "%(script)r wasn't found. Add the App Engine SDK to " \
 
 def get_unique_sequence(seq):
     seen = set()
-    return [x for x in seq if x not in seen and not seen.add(x)]
+    seen_add = seen.add
+    return [x for x in seq if x not in seen and not seen_add(x)]
+
+
+def link_tree(src, dst):
+    """Recursively replicates the directory *src* in *dst*, creating hard
+    links to the files instead of copying them. Files that can't be linked
+    (e.g., when *dst* is in a different device) are copied. Like
+    ``shutil.copytree()`` with ``symlinks=False``, symbolic links are
+    followed and their targets are replicated.
+
+    :param src:
+        Source directory.
+    :param dst:
+        Destination directory. It must not exist.
+    """
+    import shutil
+
+    for dirpath, dirnames, filenames in os.walk(src, followlinks=True):
+        dst_dir = os.path.join(dst, os.path.relpath(dirpath, src))
+        os.makedirs(dst_dir)
+        for filename in filenames:
+            src_file = os.path.join(dirpath, filename)
+            dst_file = os.path.join(dst_dir, filename)
+            try:
+                # Link the target, not the symbolic link itself.
+                os.link(os.path.realpath(src_file), dst_file)
+            except OSError:
+                shutil.copy2(src_file, dst_file)
+
+
+class DedentedDoc(object):
+    """Descriptor that returns the dedented docstring of the class it is
+    set on, or of the nearest base class with a docstring. The docstring is
+    only processed on first access, so classes with long docstrings don't pay
+    for it at import time.
+    """
+    def __init__(self):
+        self.values = {}
+
+    def __get__(self, obj, owner):
+        try:
+            return self.values[owner]
+        except KeyError:
+            doc = ''
+            for cls in owner.__mro__:
+                if cls.__doc__:
+                    doc = cls.__doc__
+                    break
+
+            value = self.values[owner] = textwrap.dedent(doc)
+            return value
+
+
+#: Objects imported by :func:`import_string`, keyed by import name. Failed
+#: imports are not cached, as they may succeed once sys.path changes.
+_import_cache = {}
 
 
 def import_string(import_name, silent=False):
     """Imports an object based on a string. If *silent* is True the return
-    value will be None if the import fails.
+    value will be None if the import fails. Imported objects are cached, so
+    repeated lookups for the same name don't go through the import machinery
+    again.
 
     Simplified version of the function with same name from `Werkzeug`_. We
     duplicate it here because this file should not depend on external packages.
@@ -40,19 +96,30 @@ def import_string(import_name, silent=False):
         The imported object.
     """
     if isinstance(import_name, unicode):
-        return import_name.encode('utf-8')
+        import_name = import_name.encode('utf-8')
 
     try:
-        if '.' in import_name:
-            module, obj = import_name.rsplit('.', 1)
-            return getattr(__import__(module, None, None, [obj]), obj)
-        else:
-            return __import__(import_name)
+        return _import_cache[import_name]
+    except KeyError:
+        pass
+
+    try:
+        rv = _import_cache[import_name] = _import_string(import_name)
+        return rv
     except (ImportError, AttributeError):
         if not silent:
             raise
 
 
+def _import_string(import_name):
+    """Uncached implementation of :func:`import_string`."""
+    if '.' in import_name:
+        module, obj = import_name.rsplit('.', 1)
+        return getattr(__import__(module, None, None, [obj]), obj)
+    else:
+        return __import__(import_name)
+
+
 class Action(object):
     """Base interface for custom actions."""
     #: Action name.
@@ -67,14 +134,21 @@ class Action(object):
     def __init__(self, manager, name):
         self.manager = manager
         self.name = name
+        # Config sections for each app, built on first use.
+        self._config_sections = {}
 
     def __call__(self, argv):
         raise NotImplementedError()
 
     def get_config_section(self):
-        sections = ['tipfy:%s' % self.name]
-        if self.manager.app:
-            sections.insert(0, '%s:%s' % (self.manager.app, self.name))
+        app = self.manager.app
+        sections = self._config_sections.get(app)
+        if sections is None:
+            sections = ('tipfy:%s' % self.name,)
+            if app:
+                sections = ('%s:%s' % (app, self.name),) + sections
+
+            self._config_sections[app] = sections
 
         return sections
 
@@ -92,14 +166,16 @@ class Action(object):
         dynamically so their modules must be in sys.path. If any of the
         functions isn't found, none will be executed.
         """
-        # Import all first.
-        hooks = []
-        for import_name in import_names:
+        # Import all first, each distinct name only once.
+        imported = {}
+        for import_name in get_unique_sequence(import_names):
             hook = import_string(import_name, True)
             if hook is None:
                 self.error('Could not import %r.' % import_name)
 
-            hooks.append(hook)
+            imported[import_name] = hook
+
+        hooks = [imported[import_name] for import_name in import_names]
 
         # Execute all.
         for hook in hooks:
@@ -117,6 +193,13 @@ class CreateAppAction(Action):
         parser.add_argument('-t', '--template', dest='template',
             help='App template, copied to the new project directory. '
             'If not defined, the default app skeleton is used.')
+        parser.add_argument('--link', action='store_true',
+            default=self.manager.config.getboolean(
+                self.get_config_section(), 'link', False),
+            help='Create hard links to the template files instead of '
+            'copying them. Files in the new app are then shared with the '
+            'template, so only use this with templates that are never '
+            'edited in place.')
         return parser
 
     def __call__(self, argv):
@@ -141,13 +224,17 @@ class CreateAppAction(Action):
 
         for app_dir in args.app_dir:
             app_dir = os.path.abspath(app_dir)
-            self.create_app(app_dir, template_dir)
+            self.create_app(app_dir, template_dir, args.link)
 
-    def create_app(self, app_dir, template_dir):
+    def create_app(self, app_dir, template_dir, link=False):
         if os.path.exists(app_dir):
             self.error('Project directory already exists: %r.' % app_dir)
 
-        shutil.copytree(template_dir, app_dir)
+        if link and hasattr(os, 'link'):
+            link_tree(template_dir, app_dir)
+        else:
+            import shutil
+            shutil.copytree(template_dir, app_dir)
 
 
 class GaeSdkAction(Action):
@@ -156,6 +243,8 @@ class GaeSdkAction(Action):
     are parsed.
     """
     def __call__(self, argv):
+        import runpy
+
         sys.argv = [self.name] + argv
         try:
             runpy.run_module(self.name, run_name='__main__', alter_sys=True)
@@ -163,57 +252,97 @@ class GaeSdkAction(Action):
             self.error(MISSING_GAE_SDK_MSG % dict(script=self.name))
 
 
+def _normalize_option(option):
+    """Converts an option in the modified getopt style used by
+    :attr:`GaeSdkExtendedAction.options` to a tuple
+    ``(long_option, short_option, is_bool)``.
+    """
+    if isinstance(option, tuple):
+        long_option, short_option = option
+    else:
+        long_option = option
+        short_option = None
+
+    is_bool = not long_option.endswith('=')
+    long_option = long_option.strip('=')
+
+    return long_option, short_option, is_bool
+
+
+class GaeSdkExtendedActionMeta(type):
+    """Normalizes the options of :class:`GaeSdkExtendedAction` subclasses
+    once, when the class is defined.
+    """
+    def __init__(cls, name, bases, dct):
+        super(GaeSdkExtendedActionMeta, cls).__init__(name, bases, dct)
+        cls._normalized_options = tuple(_normalize_option(option)
+            for option in cls.options)
+
+
 class GaeSdkExtendedAction(Action):
     """Base class for actions that wrap the App Engine SDK scripts to make
     them configurable or to add before/after hooks. It accepts all options
     from the correspondent SDK scripts, but they can be configured in
     tipfy.cfg.
     """
+    __metaclass__ = GaeSdkExtendedActionMeta
+
     options = []
 
+    #: Parsers built by :meth:`get_parser_from_getopt_options`, keyed by
+    #: action class and name, config sections and config files state.
+    _parser_cache = {}
+
     def get_base_gae_argv(self):
         raise NotImplementedError()
 
     def get_getopt_options(self):
-        for option in self.options:
-            if isinstance(option, tuple):
-                long_option, short_option = option
-            else:
-                long_option = option
-                short_option = None
-
-            is_bool = not long_option.endswith('=')
-            long_option = long_option.strip('=')
-
-            yield long_option, short_option, is_bool
+        return self._normalized_options
 
     def get_parser_from_getopt_options(self):
         manager = self.manager
         section = self.get_config_section()
 
+        config_key = getattr(manager, 'config_key', None)
+        if config_key is None:
+            # Config wasn't loaded by parse_config(): its state is unknown.
+            return self._build_parser(section)
+
+        key = (self.__class__, self.name, section, config_key)
+        parser = self._parser_cache.get(key)
+        if parser is None:
+            parser = self._parser_cache[key] = self._build_parser(section)
+
+        return parser
+
+    def _build_parser(self, section):
+        manager = self.manager
+
         usage = '%%(prog)s %(action)s [--config CONFIG] [--app APP] ' \
             '[options]' % dict(action=self.name)
 
+        # Description is set only when help is displayed.
         parser = argparse.ArgumentParser(
-            description=self.description,
             usage=usage,
             formatter_class=argparse.RawDescriptionHelpFormatter,
             add_help=False
         )
 
-        for long_option, short_option, is_bool in self.get_getopt_options():
-            args = ['--%s' % long_option]
-            kwargs = {}
+        options = self.get_getopt_options()
+        defaults = manager.config.get_many(section,
+            [o[0] for o in options if not o[2]])
+        defaults.update(manager.config.getboolean_many(section,
+            [o[0] for o in options if o[2]]))
+
+        for long_option, short_option, is_bool in options:
+            args = ['--' + long_option]
+            kwargs = {'default': defaults[long_option]}
 
             if short_option:
-                args.append('-%s' % short_option)
+                args.append('-' + short_option)
 
             if is_bool:
                 kwargs['action'] = 'store_true'
-                kwargs['default'] = manager.config.getboolean(section,
-                    long_option)
-            else:
-                kwargs['default'] = manager.config.get(section, long_option)
 
             parser.add_argument(*args, **kwargs)
 
@@ -229,25 +358,21 @@ class GaeSdkExtendedAction(Action):
         args, extras = parser.parse_known_args(args=argv)
 
         if args.help:
+            parser.description = self.description
             parser.print_help()
             sys.exit(1)
 
-        gae_argv = self.get_base_gae_argv()
-        for long_option, short_option, is_bool in self.get_getopt_options():
-            value = getattr(args, long_option)
-            if value is not None:
-                if is_bool and value:
-                    value = '--%s' % long_option
-                elif not is_bool:
-                    value = '--%s=%s' % (long_option, value)
+        values = [(long_option, is_bool, getattr(args, long_option))
+            for long_option, short_option, is_bool in self.get_getopt_options()]
 
-                if value:
-                    gae_argv.append(value)
+        # Booleans are only passed when set; other options when not None.
+        flags = ['--' + long_option if is_bool else
+            '--' + long_option + '=' + value
+            for long_option, is_bool, value in values
+            if value is not None and (value or not is_bool)]
 
         # Add app path.
-        gae_argv.append(os.path.abspath(args.app))
-
-        return gae_argv
+        return self.get_base_gae_argv() + flags + [os.path.abspath(args.app)]
 
 
 class GaeRunserverAction(GaeSdkExtendedAction):
@@ -304,7 +429,7 @@ class GaeRunserverAction(GaeSdkExtendedAction):
 
     Use "tipfy dev_appserver --help" for a description of each option.
     """
-    description = textwrap.dedent(__doc__)
+    description = DedentedDoc()
 
     # All options from dev_appserver in a modified getopt style.
     options = [
@@ -349,6 +474,8 @@ class GaeRunserverAction(GaeSdkExtendedAction):
         before_hooks = manager.config.getlist(section, 'before', [])
         after_hooks = manager.config.getlist(section, 'after', [])
 
+        import runpy
+
         # Assemble arguments.
         sys.argv = self.get_gae_argv(argv)
 
@@ -419,7 +546,7 @@ class GaeDeployAction(GaeSdkExtendedAction):
 
     Use "tipfy appcfg update --help" for a description of each option.
     """
-    description = textwrap.dedent(__doc__)
+    description = DedentedDoc()
 
     # All options from appcfg update in a modified getopt style.
     options = [
@@ -448,6 +575,8 @@ class GaeDeployAction(GaeSdkExtendedAction):
         before_hooks = manager.config.getlist(section, 'before', [])
         after_hooks = manager.config.getlist(section, 'after', [])
 
+        import runpy
+
         # Assemble arguments.
         sys.argv = self.get_gae_argv(argv)
 
@@ -471,6 +600,9 @@ class BuildAction(Action):
     cache_path = 'var/cache/packages'
     pin_file = 'var/%(app)s_pinned_versions.txt'
 
+    #: PackageFinder instance, created on first use.
+    _package_finder = None
+
     def get_parser(self):
         manager = self.manager
         # XXX cache option
@@ -541,20 +673,24 @@ class BuildAction(Action):
 
     def save_pin_file(self, pin_file, packages):
         # XXX catch errors
-        f = open(pin_file, 'w+')
-        f.write('\n'.join(packages))
-        f.close()
+        f = open(pin_file, 'w')
+        try:
+            f.writelines('%s\n' % package for package in packages)
+        finally:
+            f.close()
 
     def read_pin_file(self, pin_file):
         # XXX catch errors
         f = open(pin_file, 'r')
-        contents = f.read()
-        f.close()
-
-        packages = [line.strip() for line in contents.splitlines()]
-        return [line for line in packages if line]
+        try:
+            return [s for s in (line.strip() for line in f) if s]
+        finally:
+            f.close()
 
     def _get_package_finder(self):
+        if self._package_finder is not None:
+            return self._package_finder
+
         # XXX make mirrors configurable
         from pip.index import PackageFinder
 
@@ -563,8 +699,9 @@ class BuildAction(Action):
         mirrors = []
         index_urls = ['http://pypi.python.org/simple/']
 
-        return PackageFinder(find_links=find_links, index_urls=index_urls,
-            use_mirrors=use_mirrors, mirrors=mirrors)
+        self._package_finder = PackageFinder(find_links=find_links,
+            index_urls=index_urls, use_mirrors=use_mirrors, mirrors=mirrors)
+        return self._package_finder
 
 
 
@@ -613,15 +750,63 @@ class TipfyManager(object):
         'test':             TestAction,
     }
 
+    #: Arguments that, when used alone, only display the help message.
+    help_args = ('-h', '--help', 'help')
+
+    #: Help message displayed when no action is given. It is a template
+    #: rather than the parser's output so that the parser doesn't need to be
+    #: built just to display it. Keep it in sync with :meth:`get_parser`.
+    help_template = """\
+usage: %(prog)s [--config CONFIG] [--app APP] [--batch_file BATCH_FILE] [-h]
+%(usage_indent)s[action]
+
+%(description)s
+
+positional arguments:
+%(action_help)s
+
+optional arguments:
+  --config CONFIG       Configuration file. If not provided, uses tipfy.cfg
+                        from the current directory.
+  --app APP             App configuration to use.
+  --batch_file BATCH_FILE
+                        File with commands to execute in sequence in the same
+                        process, one per line.
+  -h, --help            Show this help message and exit.
+
+%(epilog)s
+"""
+
+    #: Sorted, comma-separated list of action names, built on first use.
+    _actions_help = None
+
     def __init__(self):
-        pass
+        # Action instances, created on first use.
+        self._action_instances = {}
+        # True while commands from a batch file are executed.
+        self._in_batch = False
 
     def __call__(self, argv):
+        if not argv or (len(argv) == 1 and argv[0] in self.help_args):
+            # Nothing to do: skip the parser and config loading.
+            sys.stdout.write(self.get_help())
+            return
+
         parser = self.get_parser()
         args, extras = parser.parse_known_args(args=argv)
 
+        if args.batch_file:
+            if self._in_batch:
+                parser.error('--batch_file can\'t be used in a batch file.')
+
+            if args.action or extras or args.config or args.app or args.help:
+                parser.error('--batch_file can\'t be combined with other '
+                    'arguments; set them in each line of the batch file.')
+
+            return self.run_batch(args.batch_file)
+
         # Load configuration.
-        self.parse_config(args.config)
+        self.parse_config(args.config or 'tipfy.cfg')
 
         # Load config fom a specific app, if defined, or use default one.
         self.app = args.app or self.config.get('tipfy', 'app')
@@ -635,8 +820,13 @@ class TipfyManager(object):
         if self.app:
             self.config.set('DEFAULT', 'app', self.app)
 
-        # Prepend configured paths to sys.path, if any.
-        sys.path[:0] = self.config.getlist(self.config_section, 'sys.path', [])
+        # Prepend configured paths to sys.path, if any, removing them from
+        # later positions so that they take precedence without duplicates.
+        paths = get_unique_sequence(self.config.getlist(self.config_section,
+            'sys.path', []))
+        if paths:
+            configured = set(paths)
+            sys.path[:] = paths + [p for p in sys.path if p not in configured]
 
         if args.action not in self.actions:
             # Unknown action or --help.
@@ -646,18 +836,103 @@ class TipfyManager(object):
             # Delegate help to action.
             extras.append('--help')
 
-        return self.actions[args.action](self, args.action)(extras)
+        return self.get_action(args.action)(extras)
+
+    def run_batch(self, batch_file):
+        """Executes commands from a file, one per line, in the same process.
+        Empty lines and lines starting with '#' are ignored. ``sys.argv``,
+        ``sys.path``, ``sys.modules`` and the :func:`import_string` cache are
+        restored after each command, so state set by one command doesn't leak
+        into the next one. Parsers cached by actions are kept, as they only
+        depend on the config. Execution stops if a command exits with an
+        error status.
+
+        :param batch_file:
+            Path to the file with commands to execute.
+        """
+        import shlex
+
+        f = open(batch_file, 'r')
+        try:
+            commands = [s for s in (line.strip() for line in f)
+                if s and not s.startswith('#')]
+        finally:
+            f.close()
+
+        self._in_batch = True
+        try:
+            for command in commands:
+                argv = sys.argv[:]
+                path = sys.path[:]
+                modules = set(sys.modules)
+                import_cache = _import_cache.copy()
+                try:
+                    self(shlex.split(command))
+                except SystemExit, e:
+                    if e.code not in (None, 0):
+                        raise
+                finally:
+                    sys.argv = argv
+                    sys.path[:] = path
+                    for name in set(sys.modules) - modules:
+                        del sys.modules[name]
+
+                    _import_cache.clear()
+                    _import_cache.update(import_cache)
+        finally:
+            self._in_batch = False
+
+    def get_action(self, name):
+        """Returns the action instance for the given action name. Instances
+        are created once and reused in subsequent calls to the manager.
+        """
+        action = self._action_instances.get(name)
+        if action is None:
+            action = self._action_instances[name] = self.actions[name](self,
+                name)
+
+        return action
+
+    def get_actions_help(self):
+        """Returns a sorted, comma-separated list of the available actions.
+        It is built once per class.
+        """
+        cls = self.__class__
+        if cls.__dict__.get('_actions_help') is None:
+            cls._actions_help = ', '.join(sorted(cls.actions.keys()))
+
+        return cls._actions_help
+
+    def get_help(self):
+        """Returns the help message of the manager, built from
+        :attr:`help_template` without building the argument parser.
+        """
+        prog = os.path.basename(sys.argv[0])
+        action_help = textwrap.fill('Action to perform. Available actions '
+            'are: %s.' % self.get_actions_help(), width=78,
+            initial_indent='  action                ',
+            subsequent_indent=' ' * 24)
+
+        return self.help_template % dict(
+            prog=prog,
+            usage_indent=' ' * len('usage: %s ' % prog),
+            description=self.description,
+            action_help=action_help,
+            epilog=self.epilog % dict(prog=prog),
+        )
 
     def get_parser(self):
-        actions = ', '.join(sorted(self.actions.keys()))
+        actions = self.get_actions_help()
         parser = argparse.ArgumentParser(description=self.description,
             epilog=self.epilog, add_help=False)
         parser.add_argument('action', help='Action to perform. '
             'Available actions are: %s.' % actions, nargs='?')
-        parser.add_argument('--config', default='tipfy.cfg',
+        parser.add_argument('--config',
             help='Configuration file. If not provided, uses tipfy.cfg from '
             'the current directory.')
         parser.add_argument('--app', help='App configuration to use.')
+        parser.add_argument('--batch_file', help='File with commands to '
+            'execute in sequence in the same process, one per line.')
         parser.add_argument('-h', '--help', help='Show this help message '
             'and exit.', action='store_true')
         return parser
@@ -667,16 +942,38 @@ class TipfyManager(object):
         in the current dir.
         """
         self.config_files = {
-            'global': os.path.realpath(os.path.join(os.path.expanduser('~'),
-                GLOBAL_CONFIG_FILE)),
-            'project': os.path.realpath(os.path.abspath(config_file)),
+            'global': os.path.realpath(os.path.expanduser(
+                os.path.join('~', GLOBAL_CONFIG_FILE))),
+            'project': os.path.realpath(config_file),
         }
 
-        self.config = Config()
-        self.config_loaded = self.config.read([
+        filenames = [
             self.config_files['global'],
             self.config_files['project'],
-        ])
+        ]
+
+        stats = self.stat_config_files(filenames)
+        # Identifies the state of the config files, e.g. for parser caching.
+        self.config_key = tuple(stats)
+
+        # Only read files that exist; the global one is often missing.
+        self.config = Config()
+        self.config_loaded = self.config.read([stat[0] for stat in stats
+            if stat[1] is not None])
+
+    def stat_config_files(self, filenames):
+        """Returns a list of ``(filename, mtime, size)`` tuples for the given
+        config files. For missing files, mtime and size are None.
+        """
+        stats = []
+        for filename in filenames:
+            try:
+                stat = os.stat(filename)
+                stats.append((filename, stat.st_mtime, stat.st_size))
+            except OSError:
+                stats.append((filename, None, None))
+
+        return stats
 
 
 def main():
@@ -6,13 +6,16 @@ gae_path = '/usr/local/google_appengine'
 
 current_path = os.path.abspath(os.path.dirname(__file__))
 tests_path = os.path.join(current_path, 'tests')
-sys.path[0:0] = [
+paths = [
     tests_path,
     gae_path,
     os.path.join(gae_path, 'lib', 'django_0_96'),
     os.path.join(gae_path, 'lib', 'webob'),
     os.path.join(gae_path, 'lib', 'yaml', 'lib'),
 ]
+# Prepend paths, removing them from later positions to avoid duplicates.
+prepended = set(paths)
+sys.path[:] = paths + [p for p in sys.path if p not in prepended]
 
 all_tests = [f[:-8] for f in os.listdir(tests_path) if f.endswith('_test.py')]
 
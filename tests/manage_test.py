@@ -5,7 +5,10 @@
 from __future__ import with_statement
 
 import ConfigParser
+import imp
 import os
+import shutil
+import tempfile
 import textwrap
 import StringIO
 import sys
@@ -13,6 +16,35 @@ import unittest
 import StringIO
 
 import test_utils
+
+manage_path = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'manage')
+
+
+def load_manage():
+    """Loads manage/manage.py and the config module it uses, without leaving
+    manage/ in sys.path or its 'config' and 'argparse' modules in sys.modules,
+    where they would shadow the ones used by other tests.
+    """
+    names = ('config', 'argparse')
+    saved_path = sys.path[:]
+    saved_modules = dict((name, sys.modules.pop(name)) for name in names
+        if name in sys.modules)
+
+    sys.path.insert(0, manage_path)
+    try:
+        module = imp.load_source('tipfy_manage',
+            os.path.join(manage_path, 'manage.py'))
+        return module, sys.modules['config']
+    finally:
+        sys.path[:] = saved_path
+        for name in names:
+            sys.modules.pop(name, None)
+
+        sys.modules.update(saved_modules)
+
+
+manage, manage_config = load_manage()
 '''
 from tipfy.manage.config import Config
 
@@ -192,5 +224,433 @@ class TestConfig(test_utils.BaseTestCase):
 '''
 
 
+class TestConfigGetMany(unittest.TestCase):
+    def get_config(self, config_text):
+        config = manage_config.Config()
+        config.readfp(StringIO.StringIO(textwrap.dedent(config_text)))
+        return config
+
+    def test_get_many(self):
+        config = self.get_config("""\
+        [DEFAULT]
+        foo = bar
+
+        [section_1]
+        baz = ding
+        """)
+
+        self.assertEqual(config.get_many('section_1', ['foo', 'baz']), {
+            'foo': 'bar',
+            'baz': 'ding',
+        })
+
+    def test_get_many_section_fallback(self):
+        config = self.get_config("""\
+        [section_1]
+        foo = 1
+
+        [section_2]
+        foo = 2
+        bar = 2
+        """)
+
+        self.assertEqual(config.get_many(['section_1', 'section_2'],
+            ['foo', 'bar']), {
+            'foo': '1',
+            'bar': '2',
+        })
+        self.assertEqual(config.get_many(['section_2', 'section_1'],
+            ['foo', 'bar']), {
+            'foo': '2',
+            'bar': '2',
+        })
+
+    def test_get_many_missing_section(self):
+        config = self.get_config("""\
+        [section_1]
+        foo = 1
+        """)
+
+        self.assertEqual(config.get_many(['missing', 'section_1'],
+            ['foo', 'bar']), {
+            'foo': '1',
+            'bar': None,
+        })
+        self.assertEqual(config.get_many('missing', ['foo']), {'foo': None})
+
+    def test_get_many_default(self):
+        config = self.get_config("""\
+        [section_1]
+        foo = 1
+        """)
+
+        self.assertEqual(config.get_many('section_1', ['foo', 'bar'],
+            default='baz'), {
+            'foo': '1',
+            'bar': 'baz',
+        })
+
+    def test_get_many_raw(self):
+        config = self.get_config("""\
+        [section_1]
+        name = foo
+        path = /path/to/%(name)s
+        """)
+
+        self.assertEqual(config.get_many('section_1', ['path']),
+            {'path': '/path/to/foo'})
+        self.assertEqual(config.get_many('section_1', ['path'], raw=True),
+            {'path': '/path/to/%(name)s'})
+
+    def test_get_many_matches_get(self):
+        config = self.get_config("""\
+        [DEFAULT]
+        foo = default
+
+        [section_1]
+        bar = 1
+
+        [section_2]
+        foo = 2
+        baz = 2
+        """)
+
+        sections = ['section_1', 'section_2']
+        options = ['foo', 'bar', 'baz', 'missing']
+        values = config.get_many(sections, options)
+        for option in options:
+            self.assertEqual(values[option], config.get(sections, option))
+
+    def test_getboolean_many(self):
+        config = self.get_config("""\
+        [section_1]
+        true_1 = yes
+
+        [section_2]
+        true_1 = no
+        false_1 = off
+        """)
+
+        self.assertEqual(config.getboolean_many(['section_1', 'section_2'],
+            ['true_1', 'false_1', 'missing'], default=True), {
+            'true_1': True,
+            'false_1': False,
+            'missing': True,
+        })
+
+
+class TestParseConfig(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.home = os.environ.get('HOME')
+        os.environ['HOME'] = self.tmp_dir
+        self.global_file = os.path.join(self.tmp_dir,
+            manage.GLOBAL_CONFIG_FILE)
+        self.project_file = os.path.join(self.tmp_dir, 'project',
+            'tipfy.cfg')
+        os.makedirs(os.path.dirname(self.project_file))
+
+    def tearDown(self):
+        if self.home is None:
+            del os.environ['HOME']
+        else:
+            os.environ['HOME'] = self.home
+
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, filename, contents):
+        f = open(filename, 'w')
+        try:
+            f.write(contents)
+        finally:
+            f.close()
+
+    def test_global_and_project(self):
+        self.write(self.global_file, '[tipfy]\nfoo = global\nbar = global\n')
+        self.write(self.project_file, '[tipfy]\nfoo = project\n')
+
+        manager = manage.TipfyManager()
+        manager.parse_config(self.project_file)
+
+        self.assertEqual(manager.config_loaded,
+            [self.global_file, self.project_file])
+        self.assertEqual(manager.config.get('tipfy', 'foo'), 'project')
+        self.assertEqual(manager.config.get('tipfy', 'bar'), 'global')
+
+    def test_missing_global(self):
+        self.write(self.project_file, '[tipfy]\nfoo = project\n')
+
+        manager = manage.TipfyManager()
+        manager.parse_config(self.project_file)
+
+        self.assertEqual(manager.config_loaded, [self.project_file])
+        self.assertEqual(manager.config.get('tipfy', 'foo'), 'project')
+
+    def test_missing_project(self):
+        manager = manage.TipfyManager()
+        manager.parse_config(self.project_file)
+
+        self.assertEqual(manager.config_loaded, [])
+        self.assertEqual(manager.config.get('tipfy', 'foo'), None)
+
+    def test_config_key(self):
+        self.write(self.project_file, '[tipfy]\nfoo = project\n')
+
+        manager = manage.TipfyManager()
+        manager.parse_config(self.project_file)
+        key = manager.config_key
+
+        manager.parse_config(self.project_file)
+        self.assertEqual(manager.config_key, key)
+
+        # Changes to the files result in a different key and new values.
+        self.write(self.project_file, '[tipfy]\nfoo = changed project\n')
+        manager.parse_config(self.project_file)
+        self.assertNotEqual(manager.config_key, key)
+        self.assertEqual(manager.config.get('tipfy', 'foo'), 'changed project')
+
+    def test_nothing_written_to_home(self):
+        self.write(self.project_file, '[tipfy]\nfoo = project\n')
+
+        manager = manage.TipfyManager()
+        manager.parse_config(self.project_file)
+
+        self.assertEqual(os.listdir(self.tmp_dir), ['project'])
+
+
+class NoParserManager(manage.TipfyManager):
+    def get_parser(self):
+        raise AssertionError('The parser should not be built.')
+
+
+class TestHelp(unittest.TestCase):
+    def setUp(self):
+        self.argv = sys.argv
+        self.stdout = sys.stdout
+        self.columns = os.environ.pop('COLUMNS', None)
+        sys.argv = ['tipfy']
+
+    def tearDown(self):
+        sys.argv = self.argv
+        sys.stdout = self.stdout
+        if self.columns is not None:
+            os.environ['COLUMNS'] = self.columns
+
+    def test_help_matches_parser(self):
+        manager = manage.TipfyManager()
+        self.assertEqual(manager.get_help(),
+            manager.get_parser().format_help())
+
+    def test_help_matches_parser_with_custom_actions(self):
+        class Manager(manage.TipfyManager):
+            actions = dict(manage.TipfyManager.actions,
+                my_custom_action=manage.TestAction)
+
+        manager = Manager()
+        self.assertEqual(manager.get_help(),
+            manager.get_parser().format_help())
+
+    def test_help_without_parser(self):
+        for argv in ([], ['-h'], ['--help'], ['help']):
+            sys.stdout = StringIO.StringIO()
+            NoParserManager()(argv)
+            self.assertEqual(sys.stdout.getvalue(),
+                manage.TipfyManager().get_help())
+
+
+class TestLinkTree(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.src = os.path.join(self.tmp_dir, 'src')
+        self.dst = os.path.join(self.tmp_dir, 'dst')
+
+        os.makedirs(os.path.join(self.src, 'real', 'sub'))
+        self.write(os.path.join(self.src, 'top.txt'), 'top')
+        self.write(os.path.join(self.src, 'real', 'sub', 'deep.txt'), 'deep')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, filename, contents):
+        f = open(filename, 'w')
+        try:
+            f.write(contents)
+        finally:
+            f.close()
+
+    def read(self, filename):
+        f = open(filename, 'r')
+        try:
+            return f.read()
+        finally:
+            f.close()
+
+    def test_link_tree(self):
+        manage.link_tree(self.src, self.dst)
+
+        self.assertEqual(sorted(os.listdir(self.dst)), ['real', 'top.txt'])
+        self.assertEqual(self.read(os.path.join(self.dst, 'top.txt')), 'top')
+        self.assertEqual(self.read(os.path.join(self.dst, 'real', 'sub',
+            'deep.txt')), 'deep')
+        self.assertTrue(os.path.samefile(os.path.join(self.src, 'top.txt'),
+            os.path.join(self.dst, 'top.txt')))
+
+    def test_link_tree_follows_symlinks(self):
+        if not hasattr(os, 'symlink'):
+            return
+
+        os.symlink(os.path.join(self.src, 'real'),
+            os.path.join(self.src, 'linked'))
+        os.symlink(os.path.join(self.src, 'top.txt'),
+            os.path.join(self.src, 'top_link.txt'))
+        manage.link_tree(self.src, self.dst)
+
+        self.assertEqual(sorted(os.listdir(self.dst)),
+            ['linked', 'real', 'top.txt', 'top_link.txt'])
+        self.assertFalse(os.path.islink(os.path.join(self.dst, 'linked')))
+        self.assertEqual(self.read(os.path.join(self.dst, 'linked', 'sub',
+            'deep.txt')), 'deep')
+        self.assertFalse(os.path.islink(os.path.join(self.dst,
+            'top_link.txt')))
+        self.assertEqual(self.read(os.path.join(self.dst, 'top_link.txt')),
+            'top')
+
+
+class RecordHooksAction(manage.Action):
+    """Runs the 'before' hooks of its config section."""
+    def __call__(self, argv):
+        section = self.get_config_section()
+        self.run_hooks(self.manager.config.getlist(section, 'before', []),
+            argv)
+
+
+class RecordParserAction(manage.GaeSdkExtendedAction):
+    """Records the parser built from its getopt options."""
+    options = [('port=', 'p')]
+
+    def __call__(self, argv):
+        self.manager.parsers.append(self.get_parser_from_getopt_options())
+
+
+class RecordingManager(manage.TipfyManager):
+    actions = {
+        'record': RecordHooksAction,
+        'record_parser': RecordParserAction,
+    }
+
+    def __init__(self):
+        manage.TipfyManager.__init__(self)
+        self.calls = []
+        self.parsers = []
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.home = os.environ.get('HOME')
+        os.environ['HOME'] = self.tmp_dir
+        self.sys_path = sys.path[:]
+
+        # Two apps with hooks in modules with the same name.
+        for app in ('a', 'b'):
+            app_dir = os.path.join(self.tmp_dir, app)
+            os.makedirs(app_dir)
+            self.write(os.path.join(app_dir, 'batch_hooks.py'),
+                'def before(manager, args):\n'
+                '    manager.calls.append(%r)\n' % app)
+            self.write(os.path.join(self.tmp_dir, '%s.cfg' % app),
+                '[tipfy]\n'
+                'sys.path = %s\n'
+                '\n'
+                '[tipfy:record]\n'
+                'before = batch_hooks.before\n' % app_dir)
+
+    def tearDown(self):
+        if self.home is None:
+            del os.environ['HOME']
+        else:
+            os.environ['HOME'] = self.home
+
+        sys.path[:] = self.sys_path
+        sys.modules.pop('batch_hooks', None)
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, filename, contents):
+        f = open(filename, 'w')
+        try:
+            f.write(contents)
+        finally:
+            f.close()
+
+    def write_batch(self, lines):
+        filename = os.path.join(self.tmp_dir, 'batch.txt')
+        self.write(filename, '\n'.join(lines))
+        return filename
+
+    def test_state_is_restored(self):
+        batch_file = self.write_batch([
+            '# Comment.',
+            '--config %s record' % os.path.join(self.tmp_dir, 'a.cfg'),
+            '',
+            '--config %s record' % os.path.join(self.tmp_dir, 'b.cfg'),
+        ])
+        sys_path = sys.path[:]
+
+        manager = RecordingManager()
+        manager(['--batch_file', batch_file])
+
+        self.assertEqual(manager.calls, ['a', 'b'])
+        self.assertEqual(sys.path, sys_path)
+        self.assertFalse('batch_hooks' in sys.modules)
+        self.assertFalse('batch_hooks.before' in manage._import_cache)
+        self.assertEqual(manager._in_batch, False)
+
+    def test_parsers_are_kept(self):
+        config_file = os.path.join(self.tmp_dir, 'a.cfg')
+        batch_file = self.write_batch([
+            '--config %s record_parser' % config_file,
+            '--config %s record_parser' % config_file,
+        ])
+
+        manager = RecordingManager()
+        manager(['--batch_file', batch_file])
+
+        self.assertEqual(len(manager.parsers), 2)
+        self.assertTrue(manager.parsers[0] is manager.parsers[1])
+
+    def test_error_stops_batch(self):
+        batch_file = self.write_batch([
+            '--config %s record' % os.path.join(self.tmp_dir, 'missing.cfg'),
+            '--config %s record' % os.path.join(self.tmp_dir, 'a.cfg'),
+        ])
+        self.write(os.path.join(self.tmp_dir, 'missing.cfg'),
+            '[tipfy:record]\n'
+            'before = batch_hooks_missing.before\n')
+        sys_path = sys.path[:]
+
+        manager = RecordingManager()
+        self.assertRaises(SystemExit, manager, ['--batch_file', batch_file])
+        self.assertEqual(manager.calls, [])
+        self.assertEqual(sys.path, sys_path)
+        self.assertEqual(manager._in_batch, False)
+
+    def test_nested_batch_file(self):
+        batch_file = self.write_batch([
+            '--batch_file %s' % os.path.join(self.tmp_dir, 'other.txt'),
+        ])
+
+        manager = RecordingManager()
+        self.assertRaises(SystemExit, manager, ['--batch_file', batch_file])
+
+    def test_batch_file_with_other_arguments(self):
+        batch_file = self.write_batch([])
+
+        manager = RecordingManager()
+        self.assertRaises(SystemExit, manager,
+            ['--batch_file', batch_file, 'record'])
+        self.assertRaises(SystemExit, manager,
+            ['--batch_file', batch_file, '--app', 'a'])
+
+
 if __name__ == '__main__':
     test_utils.main()